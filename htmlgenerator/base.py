@@ -1,10 +1,16 @@
 from __future__ import annotations
 
+import collections
 import copy
-import inspect
+import functools
+import itertools
+import os
+import secrets
 import typing
 
-from .lazy import Lazy, resolve_lazy
+import htmlgenerator
+
+from .lazy import _NESTED_LAZY_MESSAGE, Lazy, resolve_lazy
 
 EXCEPTION_HANDLER_NAME = "_htmlgenerator_exception_handler"
 "Must be a function without arguments, will be called when an exception happens during rendering an element"
@@ -12,8 +18,18 @@ EXCEPTION_HANDLER_NAME = "_htmlgenerator_exception_handler"
 # for integration with the django safe string objects, optional
 try:
     from django.utils.html import conditional_escape  # type: ignore
+    from django.utils.safestring import SafeString, mark_safe  # type: ignore
 except ImportError:
-    from .safestring import conditional_escape
+    from .safestring import SafeString, conditional_escape, mark_safe
+
+# longer strings are escaped without the cache so that large texts are not kept alive
+_ESCAPE_CACHE_MAX_LENGTH = 256
+
+
+@functools.lru_cache(maxsize=4096)
+def _escape_str(value: str) -> str:
+    """Cached escaping of short plain strings, the same texts are usually rendered many times"""
+    return conditional_escape(value)
 
 
 class BaseElement(list):
@@ -21,12 +37,18 @@ class BaseElement(list):
     All nodes used in a render tree should have this class as a base. Leaves in the tree may be strings or Lazy objects.
     """
 
+    __slots__ = ("_src_location", "_static_render", "_frozen_children")
+
     def __init__(self, *children):
         """Uses the given arguments to initialize the list which represents the child objects"""
         super().__init__(children)
+        self._static_render: typing.Optional[str] = None
+        self._frozen_children: typing.Optional[tuple] = None
         from . import DEBUG
 
         if DEBUG:
+            import inspect
+
             # This will add the source location of where this element has been instantiated as a data attributte
             # and a python attribute _src_location with (filename, linenumber, functionname) to this object
             for frame in inspect.stack():
@@ -52,60 +74,72 @@ class BaseElement(list):
         That behaviour should only be overriden by elements which consciously want
         to be able to return non-string objects during rendering.
         """
-        while isinstance(element, Lazy):
+        if isinstance(element, Lazy):
             element = element.resolve(context, self)
+            if htmlgenerator.DEBUG:
+                assert not isinstance(element, Lazy), _NESTED_LAZY_MESSAGE
         if isinstance(element, BaseElement):
-            yield from element.render(context)
+            if element._static_render is not None:
+                yield element._static_render
+            else:
+                yield from element.render(context)
         elif element is not None:
-            yield conditional_escape(element) if stringify else element
+            # frozen string children are already escaped
+            if not stringify or element.__class__ is SafeString:
+                pass
+            elif element.__class__ is str and len(element) <= _ESCAPE_CACHE_MAX_LENGTH:
+                element = _escape_str(element)
+            else:
+                element = conditional_escape(element)
+            yield element
 
     def render_children(
         self, context: dict, stringify: bool = True
     ) -> typing.Generator[str, None, None]:
         """Renders all elements inside the list. Can be used by subclassing elements if they need to controll where child elements are rendered."""
-        for element in self:
+        children = self._frozen_children if stringify else None
+        for element in self if children is None else children:
             yield from self._try_render(element, context, stringify)
 
     def render(
         self, context: dict, stringify: bool = True
     ) -> typing.Generator[str, None, None]:
         """Renders this element and its children. Can be overwritten by subclassing elements."""
+        if self._static_render is not None and stringify:
+            yield self._static_render
+            return
         try:
             yield from self.render_children(context, stringify)
         except (Exception, RuntimeError) as e:
-            import sys
-            import traceback
-
-            def default_handler(context, message):
-                traceback.print_exc()
-                print(message, file=sys.stderr)
-
-            last_obj = None
-            indent = 0
-            message = []
-            for i in traceback.StackSummary.extract(
-                traceback.walk_tb(sys.exc_info()[2]), capture_locals=True
-            ):
-                if (
-                    i.locals is not None
-                    and "self" in i.locals
-                    and i.locals["self"] != last_obj
-                ):
-                    message.append(" " * indent + str(i.locals["self"]))
-                    last_obj = i.locals["self"]
-                    indent += 2
-            message.append(" " * indent + str(e))
-            message = "\n".join(message)
-
-            context.get(EXCEPTION_HANDLER_NAME, default_handler)(context, message)
-
-            yield (
-                ""
-                + '<pre style="border: solid 1px red; color: red; padding: 1rem; background-color: #ffdddd">'
-                + f"    <code>~~~ Exception: {conditional_escape(e)} ~~~</code>"
-                + "</pre>"
-                + f'<script>alert("Error: {conditional_escape(e)}")</script>'
-            )
+            yield _render_exception(context, e)
+
+    def _is_context_free(self) -> bool:
+        """Whether the output of this element, not considering its children, is independent of the render context.
+        Elements with custom render methods can not be known to be context free."""
+        return type(self).render is BaseElement.render and _renders_children_by_default(
+            type(self)
+        )
+
+    def freeze(self) -> bool:
+        """Pre-renders every sub-tree (including self) which does not depend on the render context.
+        Frozen elements will output the pre-rendered string on later renders, so modifications to a frozen
+        element or its children will be ignored until freeze is called again.
+        returns: Whether this element itself could be frozen
+        """
+        self._static_render = None
+        self._frozen_children = None
+        static = self._is_context_free()
+        for child in self:
+            if isinstance(child, BaseElement):
+                static = child.freeze() and static
+            elif child is not None and not isinstance(child, str):
+                static = False
+        if static:
+            self._static_render = "".join(self.render({}))
+        elif _renders_children_by_default(type(self)):
+            # children of elements with a custom _try_render or render_children are passed one by one
+            self._frozen_children = _fuse_static_children(self)
+        return static
 
     """
     Tree functions
@@ -204,8 +238,29 @@ class BaseElement(list):
     def copy(self) -> BaseElement:
         return copy.deepcopy(self)
 
+    def __deepcopy__(self, memo: dict) -> BaseElement:
+        # same result as the generic deepcopy, but without going through __reduce_ex__
+        cls = self.__class__
+        new = cls.__new__(cls)
+        memo[id(self)] = new
+        list.extend(
+            new,
+            [
+                child if child.__class__ is str else copy.deepcopy(child, memo)
+                for child in self
+            ],
+        )
+        for name in _slot_names(cls):
+            if hasattr(self, name):
+                setattr(new, name, copy.deepcopy(getattr(self, name), memo))
+        if hasattr(self, "__dict__"):
+            new.__dict__.update(copy.deepcopy(self.__dict__, memo))
+        return new
+
 
 class If(BaseElement):
+    __slots__ = ("condition",)
+
     def __init__(
         self,
         condition: typing.Union[bool, Lazy],
@@ -219,13 +274,31 @@ class If(BaseElement):
     def render(self, context: dict, stringify=True):
         """The stringy argument can be set to False in order to get a python object
         instead of a rendered string returned. This is usefull when evaluating"""
+        if self._static_render is not None and stringify:
+            yield self._static_render
+            return
+        yield from self._try_render(self._selected_child(context), context, stringify)
+
+    def _selected_child(self, context: dict) -> typing.Any:
         if resolve_lazy(self.condition, context, self):
-            yield from self._try_render(self[0], context, stringify)
-        elif len(self) > 1:
-            yield from self._try_render(self[1], context, stringify)
+            return self[0]
+        return self[1] if len(self) > 1 else None
+
+    def _is_context_free(self) -> bool:
+        return (
+            type(self).render is If.render
+            and _renders_children_by_default(type(self))
+            and not isinstance(self.condition, Lazy)
+        )
 
 
 class Iterator(BaseElement):
+    """Renders the children once for every item of the iterator.
+    The item and its index are available to the children as loopvariable and loopvariable + "_index" in the context.
+    """
+
+    __slots__ = ("iterator", "loopvariable")
+
     def __init__(
         self,
         iterator: typing.Union[typing.Iterable, Lazy],
@@ -237,11 +310,85 @@ class Iterator(BaseElement):
         super().__init__(content)
 
     def render(self, context: dict, stringify: bool = True):
-        context = dict(context)
-        for i, value in enumerate(resolve_lazy(self.iterator, context, self)):
-            context[self.loopvariable] = value
-            context[self.loopvariable + "_index"] = i
-            yield from self.render_children(context, stringify)
+        if self._static_render is not None and stringify:
+            yield self._static_render
+            return
+        # instead of copying the whole context the loop variables are set on an overlay,
+        # which also keeps changes made inside of the loop away from the given context
+        variables: dict = {}
+        context = _Overlay(variables, context)
+        value_name, index_name = self._loop_names()
+        # same as self.render_children but without a generator per item,
+        # unless a subclass customizes render_children
+        children = self._frozen_children if stringify else None
+        children = self if children is None else children
+        inline = type(self).render_children is BaseElement.render_children
+        for i, value in self._items(context):
+            variables[value_name] = value
+            variables[index_name] = i
+            if not inline:
+                yield from self.render_children(context, stringify)
+                continue
+            for child in children:
+                yield from self._try_render(child, context, stringify)
+
+    def _loop_names(self) -> typing.Tuple[str, str]:
+        return (self.loopvariable, self.loopvariable + "_index")
+
+    def _items(self, context: dict) -> typing.Iterator[typing.Tuple[int, typing.Any]]:
+        return enumerate(resolve_lazy(self.iterator, context, self))
+
+    def _is_context_free(self) -> bool:
+        # other iterables might be exhausted after the first iteration
+        return (
+            type(self).render is Iterator.render
+            and _renders_children_by_default(type(self))
+            and isinstance(self.iterator, (list, tuple, range))
+        )
+
+
+@functools.lru_cache(maxsize=None)
+def _slot_names(cls: type) -> typing.Tuple[str, ...]:
+    """All slots of an element class, including the ones of its base classes"""
+    names: typing.List[str] = []
+    for base in cls.__mro__:
+        slots = base.__dict__.get("__slots__", ())
+        for name in (slots,) if isinstance(slots, str) else slots:
+            if name in ("__dict__", "__weakref__"):
+                continue
+            if name.startswith("__") and not name.endswith("__"):
+                name = f"_{base.__name__.lstrip('_')}{name}"
+            if name not in names:
+                names.append(name)
+    return tuple(names)
+
+
+class _Overlay(collections.ChainMap):
+    """Context with a dict of additional names on top of another context.
+    Lookups check the additional names first instead of catching a KeyError for every other name,
+    missing names are passed to the other context so that e.g. defaultdict keeps working.
+    """
+
+    def __getitem__(self, key):
+        names, context = self.maps
+        if key in names:
+            return names[key]
+        return context[key]
+
+
+def _private_context(context: typing.Mapping) -> typing.MutableMapping:
+    """Shallow copy of a render context, dict subclasses like defaultdict keep their behaviour"""
+    if isinstance(context, dict):
+        return copy.copy(context)
+    return collections.ChainMap({}, context)
+
+
+def _restore_names(context: dict, names: typing.Iterable[str], previous: dict) -> None:
+    for name in names:
+        if name in previous:
+            context[name] = previous[name]
+        else:
+            context.pop(name, None)
 
 
 class WithContext(BaseElement):
@@ -252,14 +399,21 @@ class WithContext(BaseElement):
     This element is required because context is otherwise only set by the render function and the loop-variable of Iterator which can be limiting.
     """
 
-    additional_context: dict = {}
+    __slots__ = ("additional_context",)
 
     def __init__(self, *children, **kwargs):
         self.additional_context = kwargs
         super().__init__(*children)
 
     def render(self, context):
-        return super().render({**context, **self.additional_context})
+        # an overlay instead of a copy of the whole context
+        return super().render(_Overlay(dict(self.additional_context), context))
+
+    def _is_context_free(self) -> bool:
+        # the additional context is only visible to lazy values, which can not be frozen
+        return type(self).render is WithContext.render and _renders_children_by_default(
+            type(self)
+        )
 
 
 def treewalk(
@@ -274,32 +428,287 @@ def treewalk(
 ) -> typing.Generator[BaseElement, None, None]:
     from .htmltags import HTMLElement
 
-    matchelements = []
-
-    for i, e in enumerate(list(element)):
-        if isinstance(e, BaseElement):
-            if filter_func is None or filter_func(e, ancestors):
-                yield e
-                matchelements.append((i, e))
-            if isinstance(e, HTMLElement):
-                yield from treewalk(
-                    list(e.attributes.values()),
-                    ancestors + (e,),
-                    filter_func=filter_func,
-                    apply=apply,
-                )
-            yield from treewalk(
-                e, ancestors + (e,), filter_func=filter_func, apply=apply
-            )
-
-    if apply:
-        for i, e in matchelements:
-            apply(element, i, e)
+    # instead of recursing, every container which is being walked has an entry on the stack:
+    # [container, ancestors, iterator over the children (created on first visit), matches]
+    stack: list = [[element, ancestors, None, []]]
+    while stack:
+        entry = stack[-1]
+        container, ancestors, children, matchelements = entry
+        if children is None:
+            children = entry[2] = enumerate(list(container))
+        for i, e in children:
+            if isinstance(e, BaseElement):
+                break
+        else:
+            stack.pop()
+            if apply:
+                for i, e in matchelements:
+                    apply(container, i, e)
+            continue
+
+        if filter_func is None or filter_func(e, ancestors):
+            yield e
+            matchelements.append((i, e))
+        # the attributes are walked before the children
+        stack.append([e, ancestors + (e,), None, []])
+        if isinstance(e, HTMLElement):
+            stack.append([list(e.attributes.values()), ancestors + (e,), None, []])
 
 
 def render(root: BaseElement, basecontext: dict) -> str:
     """Shortcut to serialize an object tree into a string"""
-    return "".join(root.render(basecontext))
+    if root._static_render is not None:
+        return root._static_render
+    return "".join(_render_tree(root, basecontext))
+
+
+def render_to(
+    root: BaseElement, write: typing.Callable[[str], typing.Any], basecontext: dict
+) -> None:
+    """Like render but passes the output in chunks to write, e.g. the write method of a file or a stream,
+    instead of building the whole document in memory. Output which has been written before an uncaught exception stays written.
+    """
+    if root._static_render is not None:
+        write(root._static_render)
+        return
+    rest = _render_tree(root, basecontext, write)
+    if rest:
+        write("".join(rest))
+
+
+class _Marker:
+    """Stack entry of _render_tree which is processed after the children of an expanded element"""
+
+    __slots__ = ()
+
+
+# closes an HTML tag
+_END_TAG = _Marker()
+# like in BaseElement.render, exceptions of the children are caught here
+_END_SCOPE = _Marker()
+# restores the context after a WithContext element, also catches exceptions
+_END_CONTEXT = _Marker()
+# end of an If element
+_END_ELEMENT = _Marker()
+# sets the loop variables for the next item of an Iterator element
+_NEXT_ITEM = _Marker()
+
+
+# number of output pieces which are collected before they are passed on by render_to
+_FLUSH_SIZE = 512
+
+
+def _render_tree(
+    root: BaseElement,
+    context: dict,
+    flush: typing.Optional[typing.Callable[[str], typing.Any]] = None,
+) -> typing.List[str]:
+    """Renders the tree the same way as root.render(context) but without a generator per element.
+    Elements which use the default render methods are expanded in place on an explicit stack,
+    all other elements are rendered through their render method.
+    If flush is given, the output is joined and passed to it after closing tags once enough pieces have been collected,
+    the remaining output is returned.
+    """
+    # loop variables are set on a private copy of the given context, made when the first loop starts
+    caller_context = context
+    private_context: typing.Optional[typing.MutableMapping] = None
+    out: typing.List[str] = []
+    stack: list = [root]
+    parents: typing.List[BaseElement] = []  # expanded elements, innermost last
+    contexts: typing.List[dict] = []  # outer contexts of expanded WithContext elements
+    loops: list = []  # (items, names, previous values) of expanded Iterator elements
+    while stack:
+        node = stack.pop()
+        try:
+            if node.__class__ is _Marker:
+                if node is _END_TAG:
+                    out.append(parents.pop()._close_tag)
+                    if flush is not None and len(out) >= _FLUSH_SIZE:
+                        flush("".join(out))
+                        out.clear()
+                elif node is _NEXT_ITEM:
+                    stack.append(node)  # stays on the stack until the loop is exhausted
+                    items, names, previous = loops[-1]
+                    item = next(items, None)
+                    if item is None:
+                        stack.pop()
+                        parents.pop()
+                        loops.pop()
+                        _restore_names(context, names, previous)
+                    else:
+                        context[names[0]] = item[1]
+                        context[names[1]] = item[0]
+                        children = parents[-1]._frozen_children
+                        stack.extend(
+                            reversed(parents[-1] if children is None else children)
+                        )
+                else:
+                    parents.pop()
+                    if node is _END_CONTEXT:
+                        context = contexts.pop()
+                continue
+
+            if isinstance(node, Lazy):
+                node = node.resolve(context, parents[-1])
+                if htmlgenerator.DEBUG:
+                    assert not isinstance(node, Lazy), _NESTED_LAZY_MESSAGE
+            if not isinstance(node, BaseElement):
+                if node.__class__ is SafeString:
+                    out.append(node)
+                elif node.__class__ is str and len(node) <= _ESCAPE_CACHE_MAX_LENGTH:
+                    out.append(_escape_str(node))
+                elif node is not None:
+                    out.append(conditional_escape(node))
+                continue
+            if node._static_render is not None:
+                out.append(node._static_render)
+                continue
+
+            kind = _render_kind(type(node))
+            if kind is None:
+                out.extend(node.render(context))
+            elif kind == "void":
+                out.append(node._opening_tag(context))
+            elif kind == "if":
+                child = node._selected_child(context)
+                if child is not None:
+                    parents.append(node)
+                    stack.append(_END_ELEMENT)
+                    stack.append(child)
+            elif kind == "loop":
+                if context is caller_context:
+                    if private_context is None:
+                        private_context = _private_context(context)
+                    context = private_context
+                names = node._loop_names()
+                previous = {name: context[name] for name in names if name in context}
+                loops.append((node._items(context), names, previous))
+                parents.append(node)
+                stack.append(_NEXT_ITEM)
+            else:
+                if kind == "tag":
+                    if not node and node._is_empty():
+                        out.append(node._empty_element)
+                        continue
+                    out.append(node._opening_tag(context))
+                    stack.append(_END_TAG)
+                elif kind == "context":
+                    contexts.append(context)
+                    context = {**context, **node.additional_context}
+                    stack.append(_END_CONTEXT)
+                else:
+                    stack.append(_END_SCOPE)
+                parents.append(node)
+                children = node._frozen_children
+                stack.extend(reversed(node if children is None else children))
+        except (Exception, RuntimeError) as e:
+            # like BaseElement.render, the closest BaseElement catches the exception
+            # and the rest of its children is skipped, loop variables are restored on the way
+            unwound = []
+            while stack:
+                node = stack.pop()
+                if node.__class__ is _Marker:
+                    unwound.append(parents.pop())
+                    if node is _NEXT_ITEM:
+                        _, names, previous = loops.pop()
+                        _restore_names(context, names, previous)
+                    elif node is _END_SCOPE:
+                        out.append(_render_exception(context, e, reversed(unwound)))
+                        break
+                    elif node is _END_CONTEXT:
+                        out.append(_render_exception(context, e, reversed(unwound)))
+                        context = contexts.pop()
+                        break
+            else:
+                raise
+    return out
+
+
+@functools.lru_cache(maxsize=None)
+def _renders_children_by_default(cls: type) -> bool:
+    """Whether elements of the given class render their children with the methods of BaseElement"""
+    return (
+        cls._try_render is BaseElement._try_render
+        and cls.render_children is BaseElement.render_children
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _render_kind(cls: type) -> typing.Optional[str]:
+    """How _render_tree can expand elements of the given class, None if the render method needs to be used"""
+    from .htmltags import HTMLElement, VoidElement
+
+    if not _renders_children_by_default(cls):
+        return None
+    return {
+        BaseElement.render: "scope",
+        HTMLElement.render: "tag",
+        VoidElement.render: "void",
+        If.render: "if",
+        Iterator.render: "loop",
+        WithContext.render: "context",
+    }.get(cls.render)
+
+
+def _fuse_static_children(children: typing.Iterable) -> tuple:
+    """Escapes string children and joins each run of adjacent strings and
+    frozen elements into a single safe string, so it is output as one piece"""
+    fused: list = []
+    run: list = []
+    for child in children:
+        if isinstance(child, str):
+            run.append(conditional_escape(child))
+        elif isinstance(child, BaseElement) and child._static_render is not None:
+            run.append(child._static_render)
+        elif child is not None:
+            if run:
+                fused.append(mark_safe("".join(run)))
+                run = []
+            fused.append(child)
+    if run:
+        fused.append(mark_safe("".join(run)))
+    return tuple(fused)
+
+
+def _render_exception(
+    context: dict, exception: BaseException, elements: typing.Iterable = ()
+) -> str:
+    """Reports an exception which happened during rendering and returns the HTML to show instead.
+    elements can be used to pass the elements, from outer to inner, which are not part of the traceback.
+    """
+    import sys
+    import traceback
+
+    def default_handler(context, message):
+        traceback.print_exc()
+        print(message, file=sys.stderr)
+
+    objects = [repr(element) for element in elements] + [
+        i.locals["self"]
+        for i in traceback.StackSummary.extract(
+            traceback.walk_tb(exception.__traceback__), capture_locals=True
+        )
+        if i.locals is not None and "self" in i.locals
+    ]
+    last_obj = None
+    indent = 0
+    message = []
+    for obj in objects:
+        if obj != last_obj:
+            message.append(" " * indent + obj)
+            last_obj = obj
+            indent += 2
+    message.append(" " * indent + str(exception))
+
+    context.get(EXCEPTION_HANDLER_NAME, default_handler)(context, "\n".join(message))
+
+    return (
+        ""
+        + '<pre style="border: solid 1px red; color: red; padding: 1rem; background-color: #ffdddd">'
+        + f"    <code>~~~ Exception: {conditional_escape(exception)} ~~~</code>"
+        + "</pre>"
+        + f'<script>alert("Error: {conditional_escape(exception)}")</script>'
+    )
 
 
 def print_logical_tree(root: BaseElement) -> None:
@@ -332,28 +741,25 @@ def print_logical_tree(root: BaseElement) -> None:
     print_node(root, level=0)
 
 
-html_id_cache = set()
+_html_id_counter = itertools.count()
+# random part of the ids, so that processes which render parts of the same page
+# (e.g. multiple workers answering partial requests) do not produce the same ids
+_html_id_namespace = secrets.token_hex(4)
+
+
+def _new_html_id_namespace() -> None:
+    global _html_id_namespace
+    _html_id_namespace = secrets.token_hex(4)
+
+
+# forked workers would otherwise share the namespace of their parent process
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_new_html_id_namespace)
 
 
 def html_id(object: typing.Any, prefix: str = "id") -> str:
     """Generate a unique HTML id from an object"""
-    # Explanation of the chained call:
-    # 1. id: We want a guaranteed unique ID. Since the lifespan of an HTML-response is
-    #       shorted than that of the working process, this should be fine. Python
-    #       might re-use objects and their according memory, but it seems unlikely
-    #       that this will be an issue.
-    # 2. str: passing an int (from the id function) into the hash-function will result
-    #        in the int beeing passed back. We need to convert the id to a string in
-    #        order have the hash function doing some actual hashing.
-    # 3. hash: Prevent the leaking of any memory layout information. The python hash
-    #         function is hard to reverse (https://en.wikipedia.org/wiki/SipHash)
-    # 4. str: Because html-ids need to be strings we convert again to string
-    # 5. [1:]: in order to prevent negative numbers we remove the first character which might be a "-"
-    _id = prefix + "-" + str(hash(str(id(object))))[1:]
-    n = 0
-    nid = _id
-    while nid in html_id_cache:
-        nid = f"{_id}-{n}"
-        n += 1
-    html_id_cache.add(nid)
-    return nid
+    # A counter is unique within the process without remembering all generated ids
+    # and does not leak any memory layout information like id(object) would.
+    # The object is only kept as an argument for compatibility.
+    return f"{prefix}-{_html_id_namespace}-{next(_html_id_counter)}"
@@ -1,4 +1,5 @@
 import codecs
+import functools
 
 import black
 from bs4 import BeautifulSoup, Comment, Doctype, NavigableString, Tag  # type: ignore
@@ -8,6 +9,7 @@ from bs4 import BeautifulSoup, Comment, Doctype, NavigableString, Tag  # type: i
 # (https://html.spec.whatwg.org/multipage/syntax.html#attributes-2)
 
 INDENT = "    "
+_HTML_SPECIAL_CHARS = frozenset("&<>'\"")
 
 
 def multiline(s):
@@ -31,7 +33,7 @@ Please open an issue on https://github.com/basxsoftwareassociation/htmlgenerator
 def marksafestring(func):
     def wrapper(s):
         ret = func(s)
-        if ret and len(ret) > 2 and any([c in ret[1:-1] for c in "&<>'\""]):
+        if ret and len(ret) > 2 and not _HTML_SPECIAL_CHARS.isdisjoint(ret[1:-1]):
             return f"s({ret})"
         return ret
 
@@ -104,6 +106,9 @@ def convert(tag, level, compact):
         raise RuntimeError(f"Unknown element type: {tag}")
 
 
+# parsing and formatting are slow, the result only depends on the arguments,
+# small maxsize because the keys are complete documents
+@functools.lru_cache(maxsize=32)
 def converthtml(html, formatting, compact):
     out = [
         "import htmlgenerator as hg\nfrom htmlgenerator import mark_safe as s\nhtml = hg.BaseElement(",
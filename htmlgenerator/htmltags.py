@@ -1,13 +1,81 @@
+import functools
+import sys
 import typing
 
-from .base import BaseElement, If
-from .lazy import Lazy, resolve_lazy
+import htmlgenerator
+
+from .base import (
+    _ESCAPE_CACHE_MAX_LENGTH,
+    BaseElement,
+    If,
+    _renders_children_by_default,
+)
+from .lazy import _NESTED_LAZY_MESSAGE, Lazy, resolve_lazy
+
+
+@functools.lru_cache(maxsize=1024)
+def _tag_strings(
+    cls: type, tag: str
+) -> typing.Tuple[str, str, str, typing.Optional[str]]:
+    """The constant parts of the tags of an element class for the given tag:
+    opening prefix, opening tag without attributes, closing tag and output of empty elements
+    (None if the class customizes its opening tag)"""
+    open_prefix = sys.intern(f"<{tag}")
+    bare_opening_tag = sys.intern(open_prefix + cls._opening_tag_end)
+    close_tag = sys.intern(f"</{tag}>")
+    empty_element = (
+        sys.intern(bare_opening_tag + close_tag)
+        if cls._build_opening_tag is HTMLElement._build_opening_tag
+        else None
+    )
+    return open_prefix, bare_opening_tag, close_tag, empty_element
+
+
+_TAG_STRING_NAMES = (
+    "_open_prefix",
+    "_bare_opening_tag",
+    "_close_tag",
+    "_empty_element",
+)
+
+
+def _tag_string(element: "HTMLElement", i: int) -> typing.Optional[str]:
+    return _tag_strings(type(element), element.tag)[i]
 
 
 class HTMLElement(BaseElement):
     """The base for all HTML tags."""
 
+    __slots__ = (
+        "attributes",
+        "lazy_attributes",
+        "_frozen_opening_tag",
+        "_frozen_attributes",
+    )
     tag: str = ""
+    _opening_tag_end: typing.ClassVar[str] = ">"
+    _open_prefix: typing.ClassVar[str]
+    _bare_opening_tag: typing.ClassVar[str]
+    _close_tag: typing.ClassVar[str]
+    _empty_element: typing.ClassVar[typing.Optional[str]]
+    _built_tag: typing.ClassVar[str]  # the tag from which the strings above are built
+
+    def __init_subclass__(cls, **kwargs):
+        # the constant parts of the tags are built once per tag
+        super().__init_subclass__(**kwargs)
+        if not isinstance(cls.tag, str):
+            # e.g. a property, the tag strings are looked up on each access instead
+            cls._built_tag = cls.tag
+            for i, name in enumerate(_TAG_STRING_NAMES):
+                setattr(cls, name, property(functools.partial(_tag_string, i=i)))
+            return
+        cls.tag = cls._built_tag = sys.intern(cls.tag)
+        (
+            cls._open_prefix,
+            cls._bare_opening_tag,
+            cls._close_tag,
+            cls._empty_element,
+        ) = _tag_strings(cls, cls.tag)
 
     def __init__(
         self, *children, lazy_attributes: typing.Optional[Lazy] = None, **attributes
@@ -20,21 +88,90 @@ class HTMLElement(BaseElement):
                 f"Argument 'lazy_attributes' must have type 'Lazy' but has type {type(lazy_attributes)}"
             )
         self.lazy_attributes = lazy_attributes
+        self._frozen_opening_tag: typing.Optional[str] = None
+        self._frozen_attributes: typing.Optional[tuple] = None
 
     def render(self, context: dict) -> typing.Generator[str, None, None]:
-        attr_str = flatattrs(
-            {
-                **self.attributes,
-                **(resolve_lazy(self.lazy_attributes, context, self) or {}),
-            },
-            context,
-            self,
+        if self._static_render is not None:
+            yield self._static_render
+            return
+        if not self and self._is_empty():
+            yield self._empty_element
+            return
+        yield self._opening_tag(context)
+        # same as super().render_children(context) but without a generator per element
+        children = self._frozen_children
+        for child in self if children is None else children:
+            yield from self._try_render(child, context, True)
+        yield self._close_tag
+
+    def _opening_tag(self, context: dict) -> str:
+        if self.tag != self._built_tag:
+            self._build_instance_tag()
+        if self._frozen_opening_tag is not None:
+            return self._frozen_opening_tag
+        return self._build_opening_tag(context)
+
+    def _build_opening_tag(self, context: dict) -> str:
+        if not self.attributes and self.lazy_attributes is None:
+            return self._bare_opening_tag
+        if self._frozen_attributes is not None:
+            attr_str = _flatattrs_frozen(self._frozen_attributes, context, self)
+        else:
+            attr_str = flatattrs(
+                {
+                    **self.attributes,
+                    **(resolve_lazy(self.lazy_attributes, context, self) or {}),
+                },
+                context,
+                self,
+            )
+        return f"{self._open_prefix}{attr_str}{self._opening_tag_end}"
+
+    def _build_instance_tag(self) -> None:
+        """Instances of subclasses without __slots__ can set their own tag,
+        the tag strings of the class are then shadowed by instance attributes"""
+        vars(self).update(
+            zip(_TAG_STRING_NAMES, _tag_strings(type(self), self.tag)),
+            _built_tag=self.tag,
         )
-        # quirk to prevent tags having a single space if there are no attributes
-        attr_str = (" " + attr_str) if attr_str else attr_str
-        yield f"<{self.tag}{attr_str}>"
-        yield from super().render_children(context)
-        yield f"</{self.tag}>"
+
+    def _is_empty(self) -> bool:
+        if self.tag != self._built_tag:
+            self._build_instance_tag()
+        return (
+            not self
+            and self._empty_element is not None
+            and not self.attributes
+            and self.lazy_attributes is None
+        )
+
+    def _is_context_free(self) -> bool:
+        return (
+            type(self).render in (HTMLElement.render, VoidElement.render)
+            and _renders_children_by_default(type(self))
+            and self._has_static_attributes()
+        )
+
+    def _has_static_attributes(self) -> bool:
+        return self.lazy_attributes is None and not any(
+            _is_dynamic_attribute(value) for value in self.attributes.values()
+        )
+
+    def freeze(self) -> bool:
+        self._frozen_opening_tag = None
+        self._frozen_attributes = None
+        for value in self.attributes.values():
+            if isinstance(value, BaseElement):
+                value.freeze()
+        static = super().freeze()
+        # the children depend on the context but the tag itself might not,
+        # interned because many elements share the same tag and attributes
+        if not static and self._has_static_attributes():
+            self._frozen_opening_tag = sys.intern(self._opening_tag({}))
+        elif not static and self.lazy_attributes is None:
+            self._frozen_attributes = _attribute_plan(self.attributes, self)
+        return static
 
     # mostly for debugging purposes
     def __repr__(self) -> str:
@@ -48,15 +185,31 @@ class HTMLElement(BaseElement):
 class VoidElement(HTMLElement):
     """Wrapper for elements without a closing tag, cannot have children"""
 
+    __slots__ = ()
+    _opening_tag_end = " />"
+
     # does not accept children
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
 
     def render(self, context) -> typing.Generator[str, None, None]:
-        yield f"<{self.tag} {flatattrs(self.attributes, context, self)} />"
+        if self._static_render is not None:
+            yield self._static_render
+            return
+        yield self._opening_tag(context)
+
+    def _build_opening_tag(self, context: dict) -> str:
+        if not self.attributes:
+            return self._bare_opening_tag
+        if self._frozen_attributes is not None:
+            attr_str = _flatattrs_frozen(self._frozen_attributes, context, self)
+        else:
+            attr_str = flatattrs(self.attributes, context, self)
+        return f"{self._open_prefix}{attr_str}{self._opening_tag_end}"
 
 
 class A(HTMLElement):
+    __slots__ = ()
     tag = "a"
 
     def __init__(self, *args, newtab=False, **kwargs):
@@ -67,238 +220,297 @@ class A(HTMLElement):
 
 
 class ABBR(HTMLElement):
+    __slots__ = ()
     tag = "abbr"
 
 
 class ACRONYM(HTMLElement):
+    __slots__ = ()
     tag = "acronym"
 
 
 class ADDRESS(HTMLElement):
+    __slots__ = ()
     tag = "address"
 
 
 class APPLET(HTMLElement):
+    __slots__ = ()
     tag = "applet"
 
 
 class AREA(VoidElement):
+    __slots__ = ()
     tag = "area"
 
 
 class ARTICLE(HTMLElement):
+    __slots__ = ()
     tag = "article"
 
 
 class ASIDE(HTMLElement):
+    __slots__ = ()
     tag = "aside"
 
 
 class AUDIO(HTMLElement):
+    __slots__ = ()
     tag = "audio"
 
 
 class B(HTMLElement):
+    __slots__ = ()
     tag = "b"
 
 
 class BASE(VoidElement):
+    __slots__ = ()
     tag = "base"
 
 
 class BASEFONT(HTMLElement):
+    __slots__ = ()
     tag = "basefont"
 
 
 class BDI(HTMLElement):
+    __slots__ = ()
     tag = "bdi"
 
 
 class BDO(HTMLElement):
+    __slots__ = ()
     tag = "bdo"
 
 
 class BGSOUND(HTMLElement):
+    __slots__ = ()
     tag = "bgsound"
 
 
 class BIG(HTMLElement):
+    __slots__ = ()
     tag = "big"
 
 
 class BLINK(HTMLElement):
+    __slots__ = ()
     tag = "blink"
 
 
 class BLOCKQUOTE(HTMLElement):
+    __slots__ = ()
     tag = "blockquote"
 
 
 class BODY(HTMLElement):
+    __slots__ = ()
     tag = "body"
 
 
 class BR(VoidElement):
+    __slots__ = ()
     tag = "br"
 
 
 class BUTTON(HTMLElement):
+    __slots__ = ()
     tag = "button"
 
 
 class CANVAS(HTMLElement):
+    __slots__ = ()
     tag = "canvas"
 
 
 class CAPTION(HTMLElement):
+    __slots__ = ()
     tag = "caption"
 
 
 class CENTER(HTMLElement):
+    __slots__ = ()
     tag = "center"
 
 
 class CITE(HTMLElement):
+    __slots__ = ()
     tag = "cite"
 
 
 class CODE(HTMLElement):
+    __slots__ = ()
     tag = "code"
 
 
 class COL(VoidElement):
+    __slots__ = ()
     tag = "col"
 
 
 class COLGROUP(HTMLElement):
+    __slots__ = ()
     tag = "colgroup"
 
 
 class COMMAND(VoidElement):
+    __slots__ = ()
     tag = "command"
 
 
 class CONTENT(HTMLElement):
+    __slots__ = ()
     tag = "content"
 
 
 class DATA(HTMLElement):
+    __slots__ = ()
     tag = "data"
 
 
 class DATALIST(HTMLElement):
+    __slots__ = ()
     tag = "datalist"
 
 
 class DD(HTMLElement):
+    __slots__ = ()
     tag = "dd"
 
 
 class DEL(HTMLElement):
+    __slots__ = ()
     tag = "del"
 
 
 class DETAILS(HTMLElement):
+    __slots__ = ()
     tag = "details"
 
 
 class DFN(HTMLElement):
+    __slots__ = ()
     tag = "dfn"
 
 
 class DIALOG(HTMLElement):
+    __slots__ = ()
     tag = "dialog"
 
 
 class DIR(HTMLElement):
+    __slots__ = ()
     tag = "dir"
 
 
 class DIV(HTMLElement):
+    __slots__ = ()
     tag = "div"
 
 
 class DL(HTMLElement):
+    __slots__ = ()
     tag = "dl"
 
 
 class DT(HTMLElement):
+    __slots__ = ()
     tag = "dt"
 
 
 class EDIASTREA(HTMLElement):
+    __slots__ = ()
     tag = "ediastrea"
 
 
 class ELEMENT(HTMLElement):
+    __slots__ = ()
     tag = "element"
 
 
 class EM(HTMLElement):
+    __slots__ = ()
     tag = "em"
 
 
 class EMBED(VoidElement):
+    __slots__ = ()
     tag = "embed"
 
 
 class FIELDSET(HTMLElement):
+    __slots__ = ()
     tag = "fieldset"
 
 
 class FIGCAPTION(HTMLElement):
+    __slots__ = ()
     tag = "figcaption"
 
 
 class FIGURE(HTMLElement):
+    __slots__ = ()
     tag = "figure"
 
 
 class FONT(HTMLElement):
+    __slots__ = ()
     tag = "font"
 
 
 class FOOTER(HTMLElement):
+    __slots__ = ()
     tag = "footer"
 
 
 class FORM(HTMLElement):
+    __slots__ = ()
     tag = "form"
 
 
 class FRAME(HTMLElement):
+    __slots__ = ()
     tag = "frame"
 
 
 class FRAMESET(HTMLElement):
+    __slots__ = ()
     tag = "frameset"
 
 
 class H1(HTMLElement):
+    __slots__ = ()
     tag = "h1"
 
 
 class H2(HTMLElement):
+    __slots__ = ()
     tag = "h2"
 
 
 class H3(HTMLElement):
+    __slots__ = ()
     tag = "h3"
 
 
 class H4(HTMLElement):
+    __slots__ = ()
     tag = "h4"
 
 
 class H5(HTMLElement):
+    __slots__ = ()
     tag = "h5"
 
 
 class H6(HTMLElement):
+    __slots__ = ()
     tag = "h6"
 
 
 class HEAD(HTMLElement):
+    __slots__ = ()
     tag = "head"
 
     def __init__(self, *children):
@@ -310,373 +522,472 @@ class HEAD(HTMLElement):
 
 
 class HEADER(HTMLElement):
+    __slots__ = ()
     tag = "header"
 
 
 class HGROUP(HTMLElement):
+    __slots__ = ()
     tag = "hgroup"
 
 
 class HR(VoidElement):
+    __slots__ = ()
     tag = "hr"
 
 
 class HTML(HTMLElement):
+    __slots__ = ("doctype",)
     tag = "html"
 
     def __init__(self, *args, doctype=False, **kwargs):
         super().__init__(*args, **kwargs)
         self.doctype = doctype
 
-    def render(self, context: dict) -> typing.Generator[str, None, None]:
-        if self.doctype:
-            yield "<!DOCTYPE html>"
-        yield from super().render(context)
+    def _build_opening_tag(self, context: dict) -> str:
+        tag = super()._build_opening_tag(context)
+        return "<!DOCTYPE html>" + tag if self.doctype else tag
 
 
 class I(HTMLElement):  # noqa
+    __slots__ = ()
     tag = "i"
 
 
 class IFRAME(HTMLElement):
+    __slots__ = ()
     tag = "iframe"
 
 
 class IMAGE(HTMLElement):
+    __slots__ = ()
     tag = "image"
 
 
 class IMG(VoidElement):
+    __slots__ = ()
     tag = "img"
 
 
 class INPUT(VoidElement):
+    __slots__ = ()
     tag = "input"
 
 
 class INS(HTMLElement):
+    __slots__ = ()
     tag = "ins"
 
 
 class ISINDEX(HTMLElement):
+    __slots__ = ()
     tag = "isindex"
 
 
 class KBD(HTMLElement):
+    __slots__ = ()
     tag = "kbd"
 
 
 class KEYGEN(VoidElement):
+    __slots__ = ()
     tag = "keygen"
 
 
 class LABEL(HTMLElement):
+    __slots__ = ()
     tag = "label"
 
 
 class LEGEND(HTMLElement):
+    __slots__ = ()
     tag = "legend"
 
 
 class LI(HTMLElement):
+    __slots__ = ()
     tag = "li"
 
 
 class LINK(VoidElement):
+    __slots__ = ()
     tag = "link"
 
 
 class LISTING(HTMLElement):
+    __slots__ = ()
     tag = "listing"
 
 
 class MAIN(HTMLElement):
+    __slots__ = ()
     tag = "main"
 
 
 class MAP(HTMLElement):
+    __slots__ = ()
     tag = "map"
 
 
 class MARK(HTMLElement):
+    __slots__ = ()
     tag = "mark"
 
 
 class MARQUEE(HTMLElement):
+    __slots__ = ()
     tag = "marquee"
 
 
 class MENU(HTMLElement):
+    __slots__ = ()
     tag = "menu"
 
 
 class MENUITEM(HTMLElement):
+    __slots__ = ()
     tag = "menuitem"
 
 
 class META(VoidElement):
+    __slots__ = ()
     tag = "meta"
 
 
 class METER(HTMLElement):
+    __slots__ = ()
     tag = "meter"
 
 
 class MULTICOL(HTMLElement):
+    __slots__ = ()
     tag = "multicol"
 
 
 class NAV(HTMLElement):
+    __slots__ = ()
     tag = "nav"
 
 
 class NEXTID(HTMLElement):
+    __slots__ = ()
     tag = "nextid"
 
 
 class NOBR(HTMLElement):
+    __slots__ = ()
     tag = "nobr"
 
 
 class NOEMBED(HTMLElement):
+    __slots__ = ()
     tag = "noembed"
 
 
 class NOFRAMES(HTMLElement):
+    __slots__ = ()
     tag = "noframes"
 
 
 class NOSCRIPT(HTMLElement):
+    __slots__ = ()
     tag = "noscript"
 
 
 class OBJECT(HTMLElement):
+    __slots__ = ()
     tag = "object"
 
 
 class OL(HTMLElement):
+    __slots__ = ()
     tag = "ol"
 
 
 class OPTGROUP(HTMLElement):
+    __slots__ = ()
     tag = "optgroup"
 
 
 class OPTION(HTMLElement):
+    __slots__ = ()
     tag = "option"
 
 
 class OUTPUT(HTMLElement):
+    __slots__ = ()
     tag = "output"
 
 
 class P(HTMLElement):
+    __slots__ = ()
     tag = "p"
 
 
 class PARAM(VoidElement):
+    __slots__ = ()
     tag = "param"
 
 
 class PICTURE(HTMLElement):
+    __slots__ = ()
     tag = "picture"
 
 
 class PLAINTEXT(HTMLElement):
+    __slots__ = ()
     tag = "plaintext"
 
 
 class PRE(HTMLElement):
+    __slots__ = ()
     tag = "pre"
 
 
 class PROGRESS(HTMLElement):
+    __slots__ = ()
     tag = "progress"
 
 
 class Q(HTMLElement):
+    __slots__ = ()
     tag = "q"
 
 
 class RB(HTMLElement):
+    __slots__ = ()
     tag = "rb"
 
 
 class RE(HTMLElement):
+    __slots__ = ()
     tag = "re"
 
 
 class RP(HTMLElement):
+    __slots__ = ()
     tag = "rp"
 
 
 class RT(HTMLElement):
+    __slots__ = ()
     tag = "rt"
 
 
 class RTC(HTMLElement):
+    __slots__ = ()
     tag = "rtc"
 
 
 class RUBY(HTMLElement):
+    __slots__ = ()
     tag = "ruby"
 
 
 class S(HTMLElement):
+    __slots__ = ()
     tag = "s"
 
 
 class SAMP(HTMLElement):
+    __slots__ = ()
     tag = "samp"
 
 
 class SCRIPT(HTMLElement):
+    __slots__ = ()
     tag = "script"
 
 
 class SECTION(HTMLElement):
+    __slots__ = ()
     tag = "section"
 
 
 class SELECT(HTMLElement):
+    __slots__ = ()
     tag = "select"
 
 
 class SHADOW(HTMLElement):
+    __slots__ = ()
     tag = "shadow"
 
 
 class SLOT(HTMLElement):
+    __slots__ = ()
     tag = "slot"
 
 
 class SMALL(HTMLElement):
+    __slots__ = ()
     tag = "small"
 
 
 class SOURCE(VoidElement):
+    __slots__ = ()
     tag = "source"
 
 
 class SPACER(HTMLElement):
+    __slots__ = ()
     tag = "spacer"
 
 
 class SPAN(HTMLElement):
+    __slots__ = ()
     tag = "span"
 
 
 class STRIKE(HTMLElement):
+    __slots__ = ()
     tag = "strike"
 
 
 class STRONG(HTMLElement):
+    __slots__ = ()
     tag = "strong"
 
 
 class STYLE(HTMLElement):
+    __slots__ = ()
     tag = "style"
 
 
 class SUB(HTMLElement):
+    __slots__ = ()
     tag = "sub"
 
 
 class SUMMARY(HTMLElement):
+    __slots__ = ()
     tag = "summary"
 
 
 class SUP(HTMLElement):
+    __slots__ = ()
     tag = "sup"
 
 
 class SVG(HTMLElement):
+    __slots__ = ()
     tag = "svg"
 
 
 class TABLE(HTMLElement):
+    __slots__ = ()
     tag = "table"
 
 
 class TBODY(HTMLElement):
+    __slots__ = ()
     tag = "tbody"
 
 
 class TD(HTMLElement):
+    __slots__ = ()
     tag = "td"
 
 
 class TEMPLATE(HTMLElement):
+    __slots__ = ()
     tag = "template"
 
 
 class TEXTAREA(HTMLElement):
+    __slots__ = ()
     tag = "textarea"
 
 
 class TFOOT(HTMLElement):
+    __slots__ = ()
     tag = "tfoot"
 
 
 class TH(HTMLElement):
+    __slots__ = ()
     tag = "th"
 
 
 class THEAD(HTMLElement):
+    __slots__ = ()
     tag = "thead"
 
 
 class TIME(HTMLElement):
+    __slots__ = ()
     tag = "time"
 
 
 class TITLE(HTMLElement):
+    __slots__ = ()
     tag = "title"
 
 
 class TR(HTMLElement):
+    __slots__ = ()
     tag = "tr"
 
 
 class TRACK(VoidElement):
+    __slots__ = ()
     tag = "track"
 
 
 class TT(HTMLElement):
+    __slots__ = ()
     tag = "tt"
 
 
 class U(HTMLElement):
+    __slots__ = ()
     tag = "u"
 
 
 class UL(HTMLElement):
+    __slots__ = ()
     tag = "ul"
 
 
 class VAR(HTMLElement):
+    __slots__ = ()
     tag = "var"
 
 
 class VIDEO(HTMLElement):
+    __slots__ = ()
     tag = "video"
 
 
 class WBR(VoidElement):
+    __slots__ = ()
     tag = "wbr"
 
 
 class XMP(HTMLElement):
+    __slots__ = ()
     tag = "xmp"
 
 
 def flatattrs(attributes: dict, context: dict, element: BaseElement) -> str:
     """Converts a dictionary to a string of HTML-attributes.
-    Leading underscores are removed and other underscores are replaced with dashes."""
+    Leading underscores are removed and other underscores are replaced with dashes.
+    The result starts with a space so it can directly follow the tag name, or is empty if there are no attributes."""
 
+    if not attributes:
+        return ""
     attlist = []
-    for key, value in attributes.items():
-        value = resolve_lazy(value, context, element)
+    for key, value in zip(_attribute_names(tuple(attributes)), attributes.values()):
+        if isinstance(value, Lazy):
+            value = value.resolve(context, element)
+            if htmlgenerator.DEBUG:
+                assert not isinstance(value, Lazy), _NESTED_LAZY_MESSAGE
+        if isinstance(value, str):  # by far the most common case
+            if len(value) <= _ESCAPE_CACHE_MAX_LENGTH:
+                attlist.append(_attr_kv(key, value))
+            else:
+                attlist.append(f'{key}="{value}"')
+            continue
         if isinstance(value, If):
             rendered = list(value.render(context, stringify=False))
             if len(rendered) == 1 and isinstance(rendered[0], bool):
@@ -684,17 +995,73 @@ def flatattrs(attributes: dict, context: dict, element: BaseElement) -> str:
             else:
                 value = "".join(rendered) if rendered else None
         elif isinstance(value, BaseElement):
-            rendered = list(value.render(context))
-            value = "".join(rendered) if rendered else None
+            # join directly from the generator, value is None if nothing has been rendered
+            rendered = value.render(context)
+            value = next(rendered, None)
+            if value is not None:
+                value += "".join(rendered)
         if value is None:
             continue
 
-        if key[0] == "_":
-            key = key[1:]
-        key = key.replace("_", "-")
-        if isinstance(value, bool) and key != "value":
-            if value is True:
-                attlist.append(f"{key}")
+        if (value is True or value is False) and key != "value":
+            if value:
+                attlist.append(key)
+        elif isinstance(value, str) and len(value) <= _ESCAPE_CACHE_MAX_LENGTH:
+            attlist.append(_attr_kv(key, value))
         else:
             attlist.append(f'{key}="{value}"')
-    return " ".join(attlist)
+    return (" " + " ".join(attlist)) if attlist else ""
+
+
+def _is_dynamic_attribute(value: typing.Any) -> bool:
+    # like for children, only plain values and frozen elements are serialized ahead of time,
+    # the string conversion of other objects might change, e.g. for lazy translations
+    if isinstance(value, BaseElement):
+        return value._static_render is None
+    return not (value is None or isinstance(value, (str, int)))
+
+
+def _attribute_plan(attributes: dict, element: BaseElement) -> tuple:
+    """Splits the attributes into runs of static attributes, which are converted to a string once,
+    and dicts with the dynamic attributes in between, which need to be converted on each render"""
+    plan: list = []
+    for key, value in attributes.items():
+        if _is_dynamic_attribute(value):
+            if plan and isinstance(plan[-1], dict):
+                plan[-1][key] = value
+            else:
+                plan.append({key: value})
+        elif plan and isinstance(plan[-1], str):
+            plan[-1] += flatattrs({key: value}, {}, element)
+        else:
+            plan.append(flatattrs({key: value}, {}, element))
+    return tuple(plan)
+
+
+def _flatattrs_frozen(plan: tuple, context: dict, element: BaseElement) -> str:
+    """Same as flatattrs but for attributes which have been prepared by _attribute_plan"""
+    return "".join(
+        part if isinstance(part, str) else flatattrs(part, context, element)
+        for part in plan
+    )
+
+
+@functools.lru_cache(maxsize=1024)
+def _attribute_names(keys: typing.Tuple[str, ...]) -> typing.Tuple[str, ...]:
+    """HTML names for a combination of attribute keys, cached because elements usually share the same few combinations"""
+    return tuple(_attribute_name(key) for key in keys)
+
+
+_UNDERSCORE_TO_DASH = str.maketrans("_", "-")
+
+
+@functools.lru_cache(maxsize=1024)
+def _attribute_name(key: str) -> str:
+    return (key[1:] if key[0] == "_" else key).translate(_UNDERSCORE_TO_DASH)
+
+
+@functools.lru_cache(maxsize=4096)
+def _attr_kv(key: str, value: str) -> str:
+    """Cached serialization of a single attribute, identical attributes are often repeated across many elements.
+    Only used for short values so that large values are not kept alive by the cache."""
+    return f'{key}="{value}"'
@@ -1,18 +1,23 @@
 from __future__ import annotations
 
-import inspect
+import functools
+import types
 import typing
 
 import htmlgenerator
 
+_NESTED_LAZY_MESSAGE = "Lazy.resolve returned a Lazy object, implementations need to pass such values through resolve_lazy"
+
 
 def resolve_lazy(
     value: typing.Any, context: dict, element: "htmlgenerator.BaseElement"
 ):
     """Shortcut to resolve a value in case it is a Lazy value"""
 
-    while isinstance(value, Lazy):
+    if isinstance(value, Lazy):
         value = value.resolve(context, element)
+        if htmlgenerator.DEBUG:
+            assert not isinstance(value, Lazy), _NESTED_LAZY_MESSAGE
     return value
 
 
@@ -35,66 +40,138 @@ def resolve_lookup(
     This is based on the implementation of the variable lookup of the django template system:
     https://github.com/django/django/blob/master/django/template/base.py
     """
+    return _resolve_lookup_bits(context, lookup.split("."), call_functions)
+
+
+def _resolve_lookup_bits(
+    context: dict, bits: typing.Iterable[str], call_functions: bool = True
+) -> typing.Any:
+    """Implementation of resolve_lookup for a lookup string which has already been split at the dots"""
+    if not call_functions:
+        current = functools.reduce(_lookup_step, bits, context)
+        return None if current is _MISSING else current
+
     current = context
-    for bit in lookup.split("."):
-        try:
-            current = current[bit]
-        except (TypeError, AttributeError, KeyError, ValueError, IndexError):
-            try:
-                current = getattr(current, bit)
-            except (TypeError, AttributeError):
-                # Reraise if the exception was raised by a @property
-                if not isinstance(current, dict) and bit in dir(current):
-                    raise
-                try:  # list-index lookup
-                    current = current[int(bit)]
-                except (
-                    IndexError,  # list index out of range
-                    ValueError,  # invalid literal for int()
-                    KeyError,  # current is a dict without `int(bit)` key
-                    TypeError,
-                ):  # unsubscriptable object
-                    return None
-                    # raise LookupError(
-                    # "Failed lookup for key " "[%s] in %r", (bit, current)
-                    # )  # missing attribute
-        if callable(current) and call_functions:
+    for bit in bits:
+        current = _lookup_step(current, bit)
+        if current is _MISSING:
+            return None
+        if callable(current):
             try:  # method call (assuming no args required)
                 current = current()
             except TypeError:
-                signature = inspect.signature(current)  # type: ignore
-                try:
-                    signature.bind()
-                except TypeError:  # arguments *were* required
-                    pass  # but we continue because we might use an attribute on the object instead of calling it
-                else:
+                # if arguments *were* required we continue because we might use an attribute on the object instead of calling it
+                if not _requires_arguments(current):
                     raise
 
     return current
 
 
+def _requires_arguments(func: typing.Callable) -> bool:
+    """Whether the signature of func does not allow calling it without arguments"""
+    function = getattr(func, "__func__", func)
+    if isinstance(function, types.FunctionType):
+        # cache on the plain function, bound methods are newly created on each attribute access
+        return _cached_requires_arguments(function, function is not func)
+    return _signature_requires_arguments(func, False)
+
+
+def _signature_requires_arguments(func: typing.Callable, bound: bool) -> bool:
+    import inspect
+
+    try:
+        inspect.signature(func).bind(*((None,) if bound else ()))
+    except TypeError:
+        return True
+    return False
+
+
+_cached_requires_arguments = functools.lru_cache(maxsize=1024)(
+    _signature_requires_arguments
+)
+
+
+_MISSING = object()
+
+
+def _lookup_step(current: typing.Any, bit: str) -> typing.Any:
+    """Accesses a single bit of a lookup on current, returns _MISSING if the lookup failed"""
+    if current is _MISSING:
+        return current
+    try:
+        return current[bit]
+    except (TypeError, AttributeError, KeyError, ValueError, IndexError):
+        try:
+            return getattr(current, bit)
+        except (TypeError, AttributeError):
+            # Reraise if the exception was raised by a @property
+            if not isinstance(current, dict) and bit in dir(current):
+                raise
+            try:  # list-index lookup
+                return current[int(bit)]
+            except (
+                IndexError,  # list index out of range
+                ValueError,  # invalid literal for int()
+                KeyError,  # current is a dict without `int(bit)` key
+                TypeError,
+            ):  # unsubscriptable object
+                return _MISSING
+                # raise LookupError(
+                # "Failed lookup for key " "[%s] in %r", (bit, current)
+                # )  # missing attribute
+
+
 class Lazy:
     """Lazy values will be evaluated at render time via the resolve method."""
 
+    __slots__ = ()
+
     def resolve(
         self, context: dict, element: "htmlgenerator.BaseElement"
     ) -> typing.Any:
+        """Must return the final value, never a Lazy object.
+        Implementations which might produce a Lazy object need to pass it through resolve_lazy."""
         raise NotImplementedError("Lazy needs to be subclassed")
 
 
 class ContextValue(Lazy):
+    __slots__ = ("_value", "_bits", "_key")
+
     def __init__(self, value: str):
         self.value = value
 
+    @property
+    def value(self) -> str:
+        return self._value
+
+    @value.setter
+    def value(self, value: str) -> None:
+        # the lookup is prepared once instead of on every resolve
+        self._value = value
+        self._bits = tuple(value.split("."))
+        # most lookups are a single key of the context
+        self._key = value if len(self._bits) == 1 else None
+
     def resolve(
         self, context: dict, element: "htmlgenerator.BaseElement"
     ) -> typing.Any:
-        return resolve_lookup(context, self.value)
+        if self._key is not None:
+            try:
+                value = context[self._key]
+            except KeyError:
+                pass
+            else:
+                # callables are handled by the full lookup
+                if not callable(value):
+                    return resolve_lazy(value, context, element)
+        return resolve_lazy(_resolve_lookup_bits(context, self._bits), context, element)
 
 
 class ContextFunction(Lazy):
     """Call a function a render time, usefull for calculation of more complex"""
 
+    __slots__ = ("func",)
+
     def __init__(
         self, func: typing.Callable[[dict, "htmlgenerator.BaseElement"], typing.Any]
     ):
@@ -104,7 +181,7 @@ class ContextFunction(Lazy):
     def resolve(
         self, context: dict, element: "htmlgenerator.BaseElement"
     ) -> typing.Any:
-        return self.func(context, element)
+        return resolve_lazy(self.func(context, element), context, element)
 
 
 C = ContextValue
@@ -8,11 +8,15 @@ import typing
 
 
 class SafeData:
+    __slots__ = ()
+
     def __html__(self) -> SafeData:
         return self
 
 
 class SafeString(str, SafeData):
+    __slots__ = ()
+
     def __add__(self, rhs) -> typing.Union[str, SafeString]:
         t = super().__add__(rhs)
         if isinstance(rhs, SafeData):
@@ -32,7 +36,10 @@ def mark_safe(s: typing.Union[str, SafeString]) -> typing.Any:
 
 
 def conditional_escape(value: typing.Any) -> typing.Union[str, SafeString]:
+    if isinstance(value, SafeData):  # cheaper than the lookup of __html__
+        return value
     if hasattr(value, "__html__"):
         return value.__html__()
     else:
-        return mark_safe(html.escape(str(value)))
+        # html.escape always returns a plain str, so mark_safe is not needed
+        return SafeString(html.escape(value if type(value) is str else str(value)))
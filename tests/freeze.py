@@ -0,0 +1,119 @@
+import unittest
+
+import htmlgenerator as hg
+
+
+class TestHTMLGeneratorFreeze(unittest.TestCase):
+    def test_static(self):
+        tree = hg.DIV(hg.SPAN("a < b", _class="x"), hg.BR(), "text")
+        expected = hg.render(tree, {})
+        self.assertTrue(tree.freeze())
+        tree.append("ignored")
+        self.assertEqual(hg.render(tree, {}), expected)
+        self.assertEqual("".join(tree.render({})), expected)
+
+    def test_partially_static(self):
+        tree = hg.DIV(hg.SPAN("static"), hg.SPAN(hg.C("value")), _class=hg.C("cls"))
+        self.assertFalse(tree.freeze())
+        self.assertIsNotNone(tree[0]._static_render)
+        self.assertIsNone(tree[1]._static_render)
+        self.assertEqual(
+            hg.render(tree, {"value": 1, "cls": "c"}),
+            '<div class="c"><span>static</span><span>1</span></div>',
+        )
+
+    def test_fused_children(self):
+        tree = hg.DIV("a & ", hg.SPAN("b"), None, "c", hg.C("value"), "d")
+        tree.freeze()
+        self.assertEqual(len(tree._frozen_children), 3)
+        expected = "<div>a &amp; <span>b</span>c1d</div>"
+        self.assertEqual(hg.render(tree, {"value": 1}), expected)
+        self.assertEqual("".join(tree.render({"value": 1})), expected)
+
+    def test_static_attributes(self):
+        tree = hg.HTML(hg.DIV(hg.C("value"), _class="x", hidden=True), doctype=True)
+        self.assertFalse(tree.freeze())
+        self.assertEqual(tree[0]._frozen_opening_tag, '<div class="x" hidden>')
+        tree[0].attributes["_class"] = "ignored"
+        expected = '<!DOCTYPE html><html><div class="x" hidden>1</div></html>'
+        self.assertEqual(hg.render(tree, {"value": 1}), expected)
+        self.assertEqual("".join(tree.render({"value": 1})), expected)
+
+    def test_dynamic_attributes(self):
+        tree = hg.DIV(
+            hg.C("value"), _class="x", href=hg.C("href"), title="t", hidden=False
+        )
+        self.assertFalse(tree.freeze())
+        self.assertEqual(len(tree._frozen_attributes), 3)
+        self.assertEqual(
+            hg.render(tree, {"value": 1, "href": "/a"}),
+            '<div class="x" href="/a" title="t">1</div>',
+        )
+
+    def test_object_attributes(self):
+        class Translated:
+            language = "en"
+
+            def __str__(self):
+                return "Delete" if self.language == "en" else "Löschen"
+
+        values = ["a"]
+        tree = hg.DIV(hg.SPAN(title=Translated(), data=values), hg.BR(_class=values))
+        self.assertFalse(tree.freeze())
+        Translated.language = "de"
+        values.append("b")
+        self.assertEqual(
+            hg.render(tree, {}),
+            "<div><span title=\"Löschen\" data=\"['a', 'b']\"></span>"
+            "<br class=\"['a', 'b']\" /></div>",
+        )
+
+    def test_virtual_elements(self):
+        tree = hg.DIV(
+            hg.If(True, "yes", "no"),
+            hg.Iterator(range(2), "i", hg.SPAN("x")),
+            hg.WithContext(hg.B("y"), name="value"),
+            title=hg.If(True, "a & b"),
+        )
+        expected = hg.render(tree, {})
+        self.assertTrue(tree.freeze())
+        self.assertEqual(hg.render(tree, {}), expected)
+        self.assertFalse(hg.If(hg.C("x"), "yes").freeze())
+        self.assertFalse(hg.Iterator(iter(range(2)), "i", "x").freeze())
+
+    def test_custom_child_rendering(self):
+        class Children(hg.BaseElement):
+            def render_children(self, context, stringify=True):
+                yield str(context.get("n"))
+
+        class Child(hg.SPAN):
+            def _try_render(self, element, context, stringify):
+                yield str(context.get("n"))
+
+        class Items(hg.UL):
+            def _try_render(self, element, context, stringify):
+                yield "<li>"
+                yield from super()._try_render(element, context, stringify)
+                yield "</li>"
+
+        tree = hg.DIV(Children(), Child("x"), hg.If(True, Children()))
+        self.assertFalse(tree.freeze())
+        self.assertEqual(hg.render(tree, {"n": 5}), "<div>5<span>5</span>5</div>")
+
+        items = Items("a", "b", hg.SPAN("c"), hg.SPAN(hg.C("n")))
+        expected = "<ul><li>a</li><li>b</li><li><span>c</span></li><li><span>5</span></li></ul>"
+        self.assertEqual(hg.render(items, {"n": 5}), expected)
+        self.assertFalse(items.freeze())
+        self.assertEqual(hg.render(items, {"n": 5}), expected)
+        self.assertEqual("".join(items.render({"n": 5})), expected)
+
+    def test_refreeze(self):
+        tree = hg.DIV("a")
+        tree.freeze()
+        tree.append("b")
+        tree.freeze()
+        self.assertEqual(hg.render(tree, {}), "<div>ab</div>")
+
+
+if __name__ == "__main__":
+    unittest.main()
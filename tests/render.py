@@ -0,0 +1,199 @@
+import unittest
+
+import htmlgenerator as hg
+
+
+class CustomElement(hg.BaseElement):
+    def render(self, context):
+        yield "<custom>"
+        yield from self.render_children(context)
+        yield "</custom>"
+
+
+class TestHTMLGeneratorRender(unittest.TestCase):
+    def test_same_as_generator(self):
+        tree = hg.HTML(
+            hg.BODY(
+                hg.DIV("a < b", hg.C("value"), _class=hg.C("value")),
+                hg.BaseElement(hg.BR(), CustomElement(hg.SPAN("x"))),
+                hg.If(hg.C("value"), hg.B("yes")),
+                hg.Iterator(range(3), "i", hg.I(hg.C("i"))),
+            ),
+            doctype=True,
+        )
+        context = {"value": "v"}
+        self.assertEqual(hg.render(tree, context), "".join(tree.render(context)))
+
+    def test_exception(self):
+        messages = []
+        context = {hg.EXCEPTION_HANDLER_NAME: lambda c, m: messages.append(m)}
+        tree = hg.BaseElement(
+            hg.DIV(hg.BaseElement("a", hg.SPAN(hg.F(lambda c, e: 1 / 0)), "b"), "c"),
+            "d",
+        )
+        self.assertEqual(hg.render(tree, context), "".join(tree.render(context)))
+        self.assertIn("<div>a<span><pre", hg.render(tree, context))
+        self.assertEqual(len(messages), 3)
+        self.assertTrue(messages[0].endswith("division by zero"))
+
+    def test_virtual_elements(self):
+        messages = []
+        context = {
+            "i": "outer",
+            hg.EXCEPTION_HANDLER_NAME: lambda c, m: messages.append(c),
+        }
+        tree = hg.BaseElement(
+            hg.Iterator(
+                range(3),
+                "i",
+                hg.WithContext(
+                    hg.SPAN(hg.C("i"), hg.C("name")),
+                    hg.If(hg.F(lambda c, e: c["i"] == 1), hg.F(lambda c, e: 1 / 0)),
+                    name="n",
+                ),
+            ),
+            hg.C("i"),
+            hg.If(False, "yes", hg.B("no")),
+        )
+        self.assertEqual(hg.render(tree, context), "".join(tree.render(context)))
+        self.assertEqual(context["i"], "outer")
+        self.assertEqual(messages[0]["name"], "n")
+
+    def test_render_to(self):
+        tree = hg.DIV(hg.Iterator(range(1000), "i", hg.SPAN(hg.C("i"))), "end")
+        chunks = []
+        hg.render_to(tree, chunks.append, {})
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual("".join(chunks), hg.render(tree, {}))
+
+    def test_context_value(self):
+        context = {"a": 1, "f": lambda: 2, "lazy": hg.C("a"), "d": {"b": 3}}
+        self.assertEqual(
+            hg.render(
+                hg.DIV(hg.C("a"), hg.C("f"), hg.C("lazy"), hg.C("d.b"), hg.C("x")),
+                context,
+            ),
+            "<div>1213</div>",
+        )
+        value = hg.C("a")
+        value.value = "d.b"
+        self.assertEqual(hg.render(hg.DIV(value), context), "<div>3</div>")
+
+    def test_long_attribute(self):
+        from htmlgenerator.htmltags import _attr_kv
+
+        value = "x" * 1000
+        cached = _attr_kv.cache_info().currsize
+        self.assertEqual(
+            hg.render(hg.DIV(title=value), {}), f'<div title="{value}"></div>'
+        )
+        self.assertEqual(_attr_kv.cache_info().currsize, cached)
+
+    def test_nested_lazy(self):
+        class Nested(hg.Lazy):
+            def resolve(self, context, element):
+                return hg.C("x")
+
+        class Resolved(hg.Lazy):
+            def resolve(self, context, element):
+                return hg.resolve_lazy(hg.C("x"), context, element)
+
+        tree = hg.DIV(Nested())
+        self.assertEqual(hg.render(hg.DIV(Resolved()), {"x": 1}), "<div>1</div>")
+        hg.DEBUG = True
+        try:
+            with self.assertRaises(AssertionError):
+                hg.render(tree, {"x": 1})
+        finally:
+            hg.DEBUG = False
+
+    def test_instance_tag(self):
+        class Heading(hg.HTMLElement):
+            tag = "h1"
+
+            def __init__(self, level, *children, **attributes):
+                super().__init__(*children, **attributes)
+                self.tag = f"h{level}"
+
+        tree = hg.DIV(
+            Heading(3, "x"), Heading(2), Heading(1, hg.C("value"), _class="c")
+        )
+        expected = '<div><h3>x</h3><h2></h2><h1 class="c">1</h1></div>'
+        self.assertEqual(hg.render(tree, {"value": 1}), expected)
+        self.assertEqual("".join(tree.render({"value": 1})), expected)
+        tree.freeze()
+        self.assertEqual(hg.render(tree, {"value": 1}), expected)
+        heading = Heading(3, "x")
+        self.assertEqual(hg.render(heading, {}), "<h3>x</h3>")
+        del heading.tag
+        self.assertEqual(hg.render(heading, {}), "<h1>x</h1>")
+
+    def test_property_tag(self):
+        class Heading(hg.HTMLElement):
+            def __init__(self, level, *children, **attributes):
+                self.level = level
+                super().__init__(*children, **attributes)
+
+            @property
+            def tag(self):
+                return f"h{self.level}"
+
+        tree = hg.DIV(
+            Heading(2, "x"), Heading(3), Heading(1, hg.C("value"), _class="c")
+        )
+        expected = '<div><h2>x</h2><h3></h3><h1 class="c">1</h1></div>'
+        self.assertEqual(hg.render(tree, {"value": 1}), expected)
+        self.assertEqual("".join(tree.render({"value": 1})), expected)
+        tree[0].level = 4
+        self.assertEqual(hg.render(tree[0], {}), "<h4>x</h4>")
+
+    def test_mapping_context(self):
+        import types
+
+        context = types.MappingProxyType({"a": "x"})
+        tree = hg.DIV(hg.Iterator(range(2), "i", hg.BaseElement(hg.C("i"), hg.C("a"))))
+        self.assertEqual(hg.render(tree, context), "<div>0x1x</div>")
+        self.assertEqual("".join(tree.render(context)), "<div>0x1x</div>")
+
+    def test_custom_iterator(self):
+        class Rows(hg.Iterator):
+            def render_children(self, context, stringify=True):
+                yield "<tr>"
+                yield from super().render_children(context, stringify)
+                yield "</tr>"
+
+        tree = hg.TABLE(Rows([1, 2], "i", hg.TD(hg.C("i"))))
+        expected = "<table><tr><td>1</td></tr><tr><td>2</td></tr></table>"
+        self.assertEqual(hg.render(tree, {}), expected)
+        self.assertEqual("".join(tree.render({})), expected)
+
+    def test_context_isolation(self):
+        import collections
+
+        class Missing(dict):
+            def __missing__(self, key):
+                return "default"
+
+        tree = hg.DIV(
+            hg.C("missing"),
+            hg.Iterator(
+                range(2),
+                "i",
+                hg.BaseElement(
+                    hg.C("i"), hg.F(lambda c, e: c.__setitem__("leak", c["i"]))
+                ),
+            ),
+        )
+        for context in (collections.defaultdict(lambda: "default"), Missing()):
+            self.assertEqual(hg.render(tree, context), "<div>default01</div>")
+            self.assertEqual("".join(tree.render(context)), "<div>default01</div>")
+            self.assertNotIn("leak", context)
+            self.assertNotIn("i", context)
+
+    def test_uncaught_exception(self):
+        with self.assertRaises(ZeroDivisionError):
+            hg.render(hg.DIV(hg.F(lambda c, e: 1 / 0)), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
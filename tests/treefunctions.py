@@ -0,0 +1,47 @@
+import unittest
+
+import htmlgenerator as hg
+
+
+class TestHTMLGeneratorTreeFunctions(unittest.TestCase):
+    def test_filter_wrap_delete(self):
+        tree = hg.DIV(hg.SPAN("a", title=hg.B("b")), hg.BaseElement(hg.SPAN("c")))
+        self.assertEqual(
+            [type(e) for e in tree.filter(lambda e, a: True)],
+            [hg.DIV, hg.SPAN, hg.B, hg.BaseElement, hg.SPAN],
+        )
+        ancestors = []
+        list(tree.filter(lambda e, a: ancestors.append(len(a))))
+        self.assertEqual(ancestors, [0, 1, 2, 1, 2])
+        tree.wrap(lambda e, a: isinstance(e, hg.SPAN), hg.P())
+        self.assertEqual(
+            hg.render(tree, {}),
+            '<div><p><span title="<b>b</b>">a</span></p><p><span>c</span></p></div>',
+        )
+        tree.delete(lambda e, a: isinstance(e, hg.P))
+        self.assertEqual(hg.render(tree, {}), "<div></div>")
+
+    def test_deep_filter(self):
+        tree = leaf = hg.DIV()
+        for _ in range(2000):
+            leaf.append(hg.DIV())
+            leaf = leaf[0]
+        self.assertEqual(len(list(tree.filter(lambda e, a: True))), 2001)
+
+    def test_copy(self):
+        shared = hg.SPAN("shared")
+        values = ["x"]
+        tree = hg.DIV(
+            shared, shared, hg.C("value"), _class="c", data=values, title=hg.C("value")
+        )
+        tree.freeze()
+        copied = tree.copy()
+        self.assertEqual(hg.render(copied, {"value": 1}), hg.render(tree, {"value": 1}))
+        self.assertIs(copied[0], copied[1])
+        self.assertIsNot(copied[0], shared)
+        self.assertEqual(copied.attributes["data"], values)
+        self.assertIsNot(copied.attributes["data"], values)
+
+
+if __name__ == "__main__":
+    unittest.main()